@@ -1,10 +1,60 @@
-from itertools import compress
 import pandas as pd
 import numpy as np
 from abc import ABCMeta, abstractmethod
 from surveyhelper.scale import QuestionScale, LikertScale, NominalScale, OrdinalScale
 from scipy.stats import ttest_ind, f_oneway, chisquare
 
+def _count_values(mat, values):
+    """
+    Returns a (columns x values) array with the number of times each 
+    of values occurs in each column of the 2D float array mat.
+    """
+    cts = np.zeros((mat.shape[1], len(values)), dtype=np.int64)
+    if len(values) == 0:
+        return(cts)
+    # Responses outside the range of values are never counted, so drop
+    # them (and infinities) up front; this keeps the bincount below 
+    # bounded by the scale rather than by stray codes in the data
+    answered = ((mat >= values.min()) & (mat <= values.max()) & 
+                np.isfinite(mat))
+    responses = mat[answered]
+    if responses.size == 0:
+        return(cts)
+    # Column of each response, so all columns are counted in one pass
+    cols = np.nonzero(answered)[1]
+    if (np.array_equal(responses, np.floor(responses)) and
+        np.array_equal(values, np.floor(values))):
+        # Integer coded responses can be counted directly, once they 
+        # are offset so the lowest value (which may be negative, e.g. 
+        # a -99 "don't know" code) maps to bin 0
+        low = values.min()
+        width = int(values.max() - low) + 1
+        counts = np.bincount(cols*width + (responses - low).astype(np.int64),
+                             minlength=mat.shape[1]*width)
+        return(counts.reshape(-1, width)[:, (values - low).astype(np.int64)])
+    else:
+        order = np.argsort(values)
+        idx = np.minimum(np.searchsorted(values[order], responses), 
+                         len(values)-1)
+        found = values[order][idx] == responses
+        counts = np.bincount(cols[found]*len(values) + order[idx[found]],
+                             minlength=cts.size)
+        return(counts.reshape(cts.shape))
+
+def _format_pcts(pcts, pct_format, valid=True, formatted=True):
+    """
+    Formats an array of proportions, or returns a "-" placeholder for
+    each one if valid is False (i.e. there were no respondents). If 
+    formatted is False the proportions are returned as floats, with NaN
+    in place of the placeholder.
+    """
+    if not formatted:
+        return([float(p) if valid else np.nan for p in pcts])
+    elif valid:
+        return([format(p, pct_format) for p in pcts])
+    else:
+        return(["-"]*len(pcts))
+
 class MatrixQuestion:
     __metaclass__ = ABCMeta
 
@@ -12,23 +62,36 @@ class MatrixQuestion:
         self.text = text
         self.questions = questions
         self.label = label
+        self.clear_cache()
         self.assert_questions_same_type()
         self.assert_choices_same()
         self.assign_children_to_matrix()
 
+    def clear_cache(self):
+        """
+        Forgets the choice check and variable names computed from the 
+        sub-questions. Called whenever the matrix changes them.
+        """
+        self._checked_choices = None
+        self._var_names = None
+
     def exclude_choices_from_analysis(self, choices):
+        self.clear_cache()
         for q in self.questions:
             q.exclude_choices_from_analysis(choices)
 
     def reverse_choices(self):
+        self.clear_cache()
         for q in self.questions:
             q.reverse_choices()
 
     def change_scale(self, newtype, values = None, midpoint = None):
+        self.clear_cache()
         for q in self.questions:
             q.change_scale(newtype, values, midpoint)
 
     def change_midpoint(self, midpoint):
+        self.clear_cache()
         for q in self.questions:
             q.scale.midpoint = midpoint
 
@@ -44,8 +107,24 @@ class MatrixQuestion:
         else:
             raise(Exception("Questions in a matrix must all have the same type"))
 
+    def _choices_state(self):
+        """
+        Returns the cached signature and midpoint of each sub-question's
+        scale. A scale drops its signature whenever its choices change, 
+        so an unchanged scale returns the very same signature object.
+        """
+        return([(q.scale._signature(), getattr(q.scale, "midpoint", None))
+                for q in self.questions])
+
     def assert_choices_same(self):
-        if all([x.scale == self.questions[0].scale for x in self.questions]):
+        state = self._choices_state()
+        checked = self._checked_choices
+        if (checked is not None and len(checked) == len(state) and
+            all(a[0] is b[0] and a[1] == b[1] 
+                for a, b in zip(checked, state))):
+            return(True)
+        if all(x.scale == self.questions[0].scale for x in self.questions):
+            self._checked_choices = state
             return(True)
         else:
             raise(Exception("Questions in a matrix must all have the same choices"))
@@ -56,10 +135,10 @@ class MatrixQuestion:
         return
 
     def get_variable_names(self):
-        names = []
-        for q in self.questions:
-            names += q.get_variable_names()
-        return(names)
+        if self._var_names is None:
+            self._var_names = tuple(v for q in self.questions 
+                                    for v in q.get_variable_names())
+        return(list(self._var_names))
 
     def get_children_text(self):
         return([q.text for q in self.questions])
@@ -97,36 +176,36 @@ class SelectOneMatrixQuestion(MatrixQuestion):
 
     def frequency_table(self, df, show="ct", pct_format=".0%",
                         remove_exclusions = True, show_totals=True, 
-                        show_mean=True, mean_format=".1f"):
+                        show_mean=True, mean_format=".1f", formatted=True):
         if len(self.questions) == 0:
             return(pd.DataFrame())
-        data = []
-        if show == "ct":
-            for q in self.questions:
-                data.append(q.frequency_table(df, False, True,
-                            False, pct_format, remove_exclusions,
-                            show_totals, show_mean,
-                           ).iloc[:,0].tolist())
-        elif show == "pct":
-            for q in self.questions:
-                data.append(q.frequency_table(df, False, False,
-                            True, pct_format, remove_exclusions, 
-                            show_totals, show_mean
-                           ).iloc[:,0].tolist())
-        else:
+        if show not in ["ct", "pct"]:
             raise(Exception("Invalid 'show' parameter: {}".format(show)))
-        tbl = pd.DataFrame(data)
-        tmpcols = self.get_choices(remove_exclusions)
-
+        # All questions share the same choices, so the whole block of
+        # responses can be counted in one pass
+        values = self.get_scale().get_values_array(remove_exclusions)
+        cts = _count_values(df[self.get_variable_names()].to_numpy(
+                            dtype=float), values)
+        totals = cts.sum(axis=1)
+        means = np.where(totals > 0, 
+                         cts.dot(values)/np.maximum(totals, 1), np.nan)
+        data = cts
+        if show == "pct":
+            pcts = cts/np.maximum(totals, 1)[:, np.newaxis]
+            data = [_format_pcts(p, pct_format, n > 0, formatted) 
+                    for p, n in zip(pcts, totals)]
+            if formatted:
+                totals = [format(1, pct_format)]*len(totals)
+            else:
+                totals = [1.0]*len(totals)
+        if formatted:
+            means = [format(m, mean_format) for m in means]
+        tbl = pd.DataFrame(data, columns=self.get_choices(remove_exclusions))
         if show_totals:
-            tmpcols.append("Total")
+            tbl["Total"] = totals
         if show_mean:
-            tmpcols.append("Mean")
-        tbl.columns = tmpcols
-        tbl["Question"] = self.get_children_text()
-        cols = tbl.columns.tolist()
-        cols = cols[-1:] + cols[:-1]
-        tbl = tbl[cols]
+            tbl["Mean"] = means
+        tbl.insert(0, "Question", self.get_children_text())
         return(tbl)
 
     def cut_by_question(self, other_question, response_set, 
@@ -135,8 +214,10 @@ class SelectOneMatrixQuestion(MatrixQuestion):
                         show_mean=True, mean_format=".1f"):
         if type(other_question) != SelectOneQuestion:
             raise(Exception("Can only call cut_by_question on a SelectOneQuestion type"))
-        groups = response_set.groupby(other_question.label)
-        group_mapping = dict(zip(other_question.values, other_question.choices))
+        groups = other_question._group_by_responses(response_set.data, 
+                                                    remove_exclusions)
+        group_mapping = dict(zip(other_question.scale.values, 
+                                 other_question.scale.choices))
         oth_text = cut_var_label
         if not oth_text:
             oth_text = other_question.text
@@ -147,7 +228,10 @@ class SelectOneMatrixQuestion(MatrixQuestion):
                question_labels=None, pct_format=".0%",
                remove_exclusions=True, show_mean=True, mean_format=".1f"):
 
-        results = []
+        if len(self.questions) == 0:
+            return(pd.DataFrame())
+        arrs = []
+        idx_tuples = []
         labels = question_labels
         if not labels:
             labels = [q.text for q in self.questions]
@@ -155,10 +239,12 @@ class SelectOneMatrixQuestion(MatrixQuestion):
             r = q.cut_by(groups, group_label_mapping, cut_var_label,
                          l, pct_format, remove_exclusions, 
                          show_mean, mean_format)
-            # r.columns = pd.MultiIndex.from_tuples([(q.text, b) for a, b in 
-            #             r.columns.tolist()])
-            results.append(r.T)
-        return(pd.concat(results))
+            # Collect the transposed values and their (question, choice)
+            # labels, so the result is built with a single allocation
+            arrs.append(r.to_numpy().T)
+            idx_tuples.extend(r.columns.tolist())
+        return(pd.DataFrame(np.vstack(arrs), columns=r.index,
+                            index=pd.MultiIndex.from_tuples(idx_tuples)))
 
 
     def freq_table_to_json(self, df):
@@ -182,43 +268,30 @@ class SelectMultipleMatrixQuestion(MatrixQuestion):
 
     def get_choices(self, remove_exclusions=True):
         self.assert_choices_same()
-        if len(self.questions > 0):
-            return(self.questions[0].get_choices(remove_exclusions))
+        if len(self.questions) > 0:
+            return(self.questions[0].scale.get_choices(remove_exclusions))
         else:
-            []
+            return([])
 
     def frequency_table(self, df, show="ct", pct_format=".0%",
-                        remove_exclusions = True, show_totals=True):
-        data = []
-        if show == "ct":
-            for q in self.questions:
-                data.append(q.frequency_table(df, False, True,
-                            False, False, pct_format, remove_exclusions,
-                            False).iloc[:,0].tolist())
-        elif show == "pct_respondents":
-            for q in self.responses:
-                data.append(q.frequency_table(df, False, False, 
-                            True, False, pct_format, remove_exclusions,
-                            False).iloc[:,0].tolist())
-        elif show == "pct_responses":
-            for q in self.responses:
-                data.append(q.frequency_table(df, False, False, 
-                            False, True, pct_format, remove_exclusions,
-                            False).iloc[:,0].tolist())
-        else:
-            raise(Exception("Invalid 'show' parameter: {}".format(show)))       
-        tbl = pd.DataFrame(data)
-
-        tbl.columns = self.get_choices(remove_exclusions)
-        tbl["Question"] = self.get_children_text()
-        cols = tbl.columns.tolist()
-        cols = cols[-1:] + cols[:-1]
-        tbl = tbl[cols]
+                        remove_exclusions = True, show_totals=True,
+                        formatted=True):
+        if show not in ["ct", "pct_respondents", "pct_responses"]:
+            raise(Exception("Invalid 'show' parameter: {}".format(show)))
+        vectors = []
+        totals = []
+        for q in self.questions:
+            freqs, resp = q._freq_vector(df, show, remove_exclusions)
+            vectors.append(freqs)
+            totals.append(resp)
+        data = np.stack(vectors)
+        if show != "ct":
+            data = [_format_pcts(f, pct_format, n > 0, formatted) 
+                    for f, n in zip(data, totals)]
+        tbl = pd.DataFrame(data, columns=self.get_choices(remove_exclusions))
+        tbl.insert(0, "Question", self.get_children_text())
         if show_totals:
-            tots = []
-            for q in self.questions:
-                tots.append(q.get_total_respondents(df))
-            tbl["Total Respondents"] = tots
+            tbl["Total Respondents"] = totals
         return(tbl)
 
 class SelectQuestion:
@@ -231,6 +304,24 @@ class SelectQuestion:
     def get_scale(self):
         return(self.scale)
 
+    def _cut_by_raw(self, groups, remove_exclusions=True):
+        """
+        Returns ([group keys], counts, respondents) tuple where counts
+        is a (groups x choices) array of response frequencies and
+        respondents is the number of respondents in each group.
+        """
+        keys = []
+        cts = []
+        resp = []
+        for k, gp in groups:
+            freqs, n, x = self.tally(gp, remove_exclusions)
+            keys.append(k)
+            cts.append(freqs)
+            resp.append(n)
+        cts = np.array(cts, dtype=float).reshape(len(keys), 
+                  len(self.scale.get_choices(remove_exclusions)))
+        return(keys, cts, np.array(resp))
+
     def change_scale(self, newtype, values = None, midpoint = None):
         self.scale = QuestionScale.change_scale(self.scale, newtype)
 
@@ -289,13 +380,20 @@ class SelectOneQuestion(SelectQuestion):
         self.scale.reverse_choices()
 
     def mean(self, df, remove_exclusions=True):
-        values = self.scale.get_values(remove_exclusions)
-        freq, n, x = self.tally(df, remove_exclusions)
-        num = sum([ct * v for ct, v in zip(freq, values)])
-        if n > 0:
-            return(num/n)
+        return(self._tally_and_mean(df, remove_exclusions)[3])
+
+    def _tally_and_mean(self, df, remove_exclusions=True):
+        """
+        Returns ([response frequencies], respondents, nonrespondents,
+        mean) tuple from a single pass over the column.
+        """
+        cts, resp, nonresp = self.tally(df, remove_exclusions)
+        if resp > 0:
+            values = self.scale.get_values_array(remove_exclusions)
+            mean = float(np.dot(cts, values))/resp
         else:
-            return(np.nan)
+            mean = np.nan
+        return((cts, resp, nonresp, mean))
 
     def tally(self, df, remove_exclusions=True):
         """
@@ -303,27 +401,25 @@ class SelectOneQuestion(SelectQuestion):
         tuple where response frequencies is a count of responses for 
         each answer choice in order.
         """
-        unit_record = df[self.variable]
-        freqs = dict(unit_record.value_counts())
-        cts = []
-        values = self.scale.get_values(remove_exclusions)
-        for k in values:
-            if k in freqs:
-                cts.append(freqs[k])
-            else:
-                cts.append(0)
+        unit_record = df[[self.variable]].to_numpy(dtype=float)
+        values = self.scale.get_values_array(remove_exclusions)
+        cts = _count_values(unit_record, values)[0].tolist()
         return((cts, sum(cts), len(unit_record)-sum(cts)))
 
 
     def frequency_table(self, df, show_question=True, ct=True, 
                         pct=True, pct_format=".0%", remove_exclusions=True,
                         show_totals=True, show_mean=True, mean_format=".1f",
-                        show_values=True):
-        cts, resp, nonresp = self.tally(df, remove_exclusions)
+                        show_values=True, formatted=True):
+        cts, resp, nonresp, avg = self._tally_and_mean(df, remove_exclusions)
         data = []
         cols = []
         tots = []
         mean = []
+        # Unformatted tables keep numbers as numbers, with NaN for blanks
+        blank = "" if formatted else np.nan
+        if formatted:
+            avg = format(avg, mean_format)
         if show_question:
             data.append(self.scale.choices_to_str(remove_exclusions, show_values))
             cols.append("Answer")
@@ -333,29 +429,24 @@ class SelectOneQuestion(SelectQuestion):
             data.append(cts)
             cols.append("Count")
             tots.append(resp)
-            mean.append(format(self.mean(df, remove_exclusions), 
-                        mean_format))
+            mean.append(avg)
         if pct:
-            l = []
-            for x in cts:
-                if resp > 0:
-                    l.append(format(x/resp, pct_format))
-                else:
-                    l.append("-")
-            data.append(l)
+            pcts = np.asarray(cts, dtype=float)/max(resp, 1)
+            data.append(_format_pcts(pcts, pct_format, resp > 0, formatted))
             cols.append("%")
-            tots.append(format(1, pct_format))
+            tots.append(format(1, pct_format) if formatted else 1.0)
             if not ct:
-                mean.append(format(self.mean(df, remove_exclusions), 
-                            mean_format))
+                mean.append(avg)
             else:
-                mean.append("")
-        tbl = pd.DataFrame(data).T
-        tbl.columns = cols
+                mean.append(blank)
+        # Build each column in full, so the table is constructed once
+        # with a native dtype per column rather than transposed and 
+        # then grown row by row
         if show_totals:
-            tbl.loc[len(tbl)] = tots
+            data = [d + [t] for d, t in zip(data, tots)]
         if show_mean:
-            tbl.loc[len(tbl)] = mean
+            data = [d + [m] for d, m in zip(data, mean)]
+        tbl = pd.DataFrame(dict(zip(cols, data)), columns=cols)
         return(tbl)
 
     def cut_by_question(self, other_question, response_set, 
@@ -364,17 +455,11 @@ class SelectOneQuestion(SelectQuestion):
                         show_mean=True, mean_format=".1f"):
         if type(other_question) != SelectOneQuestion:
             raise(Exception("Can only call cut_by_question on a SelectOneQuestion type"))
-        df = response_set.data.copy()
         # Here we remove the exclusions for the cut variable, the 
         # exclusions for this question are removed in cut_by, if 
         # appropriate
-        if remove_exclusions:
-            values_to_drop = other_question.scale.excluded_choices()
-            for v in values_to_drop:
-                df[other_question.variable].replace(v, np.nan,
-                                                    inplace=True)
-
-        groups = df.groupby(other_question.label)
+        groups = other_question._group_by_responses(response_set.data, 
+                                                    remove_exclusions)
         group_mapping = dict(zip(other_question.scale.values, other_question.scale.choices))
 
         oth_text = cut_var_label
@@ -383,19 +468,57 @@ class SelectOneQuestion(SelectQuestion):
         return(self.cut_by(groups, group_mapping, oth_text, question_label,
                pct_format, remove_exclusions, show_mean, mean_format))
 
+    def _group_by_responses(self, df, remove_exclusions=True):
+        """
+        Returns df grouped by the response to this question, in scale 
+        order. If remove_exclusions is set, responses to excluded 
+        choices are left out of the groups. Only the grouping key is 
+        re-coded, df itself is not copied.
+        """
+        # Responses that are not among the categories, including the 
+        # excluded ones when remove_exclusions is set, become NaN and 
+        # are dropped from the groups
+        key = pd.Categorical(df[self.variable].to_numpy(dtype=float),
+                  categories=self.scale.get_values_array(remove_exclusions))
+        # Group by a named key aligned with df, so the groups carry this
+        # question's label as the original column grouping did
+        return(df.groupby(pd.Series(key, index=df.index, name=self.label),
+                          observed=True))
+
+    def _cut_by_raw(self, groups, remove_exclusions=True):
+        """
+        Returns ([group keys], counts, respondents) tuple where counts 
+        is a (groups x choices) array of response frequencies, taken 
+        from a single crosstab of this question against the groups.
+        """
+        keys = groups.size().index.tolist()
+        codes = groups.ngroup()
+        ct = pd.crosstab(groups.obj[self.variable], codes)
+        ct = ct.reindex(index=self.scale.get_values_array(remove_exclusions),
+                        columns=range(len(keys)), fill_value=0)
+        cts = ct.to_numpy(dtype=float).T
+        return(keys, cts, cts.sum(axis=1))
+
     def cut_by(self, groups, group_label_mapping, cut_var_label, 
                question_label=None, pct_format=".0%",
                remove_exclusions=True, show_mean=True, mean_format=".1f"):
 
-        freqs = []
-        for k, gp in groups:
-            t = (self.frequency_table(gp, True, False, True, pct_format,
-                 remove_exclusions, False, show_mean, mean_format))
-            t.set_index("Answer", inplace=True)
-            series = t.ix[:,0]
-            series.name = group_label_mapping[k]
-            freqs.append(series)
-        df = pd.DataFrame(freqs)
+        keys, cts, resp = self._cut_by_raw(groups, remove_exclusions)
+        values = self.scale.get_values_array(remove_exclusions)
+        pcts = cts/np.maximum(resp, 1)[:, np.newaxis]
+        means = np.where(resp > 0, cts.dot(values)/np.maximum(resp, 1), 
+                         np.nan)
+        rows = []
+        for p, n, mean in zip(pcts, resp, means):
+            row = _format_pcts(p, pct_format, n > 0)
+            if show_mean:
+                row.append(format(mean, mean_format))
+            rows.append(row)
+        cols = self.scale.choices_to_str(remove_exclusions, True)
+        if show_mean:
+            cols.append("Mean")
+        df = pd.DataFrame(rows, columns=cols,
+                          index=[group_label_mapping[k] for k in keys])
 
         if show_mean:
             if self.compare_groups(groups):
@@ -425,10 +548,10 @@ class SelectOneQuestion(SelectQuestion):
         if len(groupby) == 2:
             ts, ps = ttest_ind(*data, equal_var=False)
             return(ps < pval)
-        elif len(groupby.groups.keys()) == 2:
+        elif len(groupby) > 2:
             # ANOVA
             f, p = f_oneway(*data)
-            return(p < .05)
+            return(p < pval)
         else:
             return(False)
 
@@ -451,13 +574,32 @@ class SelectMultipleQuestion(SelectQuestion):
         self.matrix = matrix
         self.scale = QuestionScale.create_scale('nominal', choices, 
                                                 exclude_from_analysis)
+        self._included_variables = None
 
     def get_variable_names(self):
         return(self.variables)
 
+    def get_included_variables(self, remove_exclusions=True):
+        """
+        Returns the variables for the answer choices that are not 
+        excluded from analysis, or all variables if remove_exclusions 
+        is False.
+        """
+        if not remove_exclusions:
+            return(list(self.variables))
+        if self._included_variables is None:
+            self._included_variables = tuple(v for v, m in 
+                zip(self.variables, self.scale.include_mask()) if m)
+        return(list(self._included_variables))
+
+    def exclude_choices_from_analysis(self, choices):
+        super().exclude_choices_from_analysis(choices)
+        self._included_variables = None
+
     def reverse_choices(self):
         self.scale.reverse_choices()
         self.variables.reverse()
+        self._included_variables = None
 
     def pretty_print(self, show_choices=True):
         print("{} ({})".format(self.text, self.label))
@@ -480,36 +622,41 @@ class SelectMultipleQuestion(SelectQuestion):
         responses for each answer choice. Int1 is the number of 
         respondents, and int2 is the number of nonrespondents.
         """
-        vars = self.variables
-        if remove_exclusions:
-            vars = list(compress(vars, 
-                   [not x for x in self.scale.exclude_from_analysis]))
-        unit_record = df[vars]
-        nonrespondents = 0
-        respondents = 0
-
-        cts = [0]*len(vars)
-        for index, row in unit_record.iterrows():
-            if row.dropna().empty:
-                nonrespondents += 1
-            else:
-                respondents += 1
-                ct = 0
-                for i, v in row.iteritems():
-                    if not np.isnan(v):
-                        cts[ct] += 1
-                    ct += 1
+        vars = self.get_included_variables(remove_exclusions)
+        notna = ~np.isnan(df[vars].to_numpy(dtype=float))
+        cts = notna.sum(axis=0).tolist()
+        respondents = int(notna.any(axis=1).sum())
+        nonrespondents = int(len(notna) - respondents)
         return(cts, respondents, nonrespondents)
 
 
+    def _freq_vector(self, df, mode="ct", remove_exclusions=True):
+        """
+        Returns (array, respondents) tuple where array holds the count 
+        (mode "ct"), proportion of respondents (mode "pct_respondents") 
+        or proportion of responses (mode "pct_responses") for each 
+        answer choice in order.
+        """
+        cts, resp, nonresp = self.tally(df, remove_exclusions)
+        freqs = np.array(cts)
+        if mode == "pct_respondents":
+            freqs = freqs/max(resp, 1)
+        elif mode == "pct_responses":
+            freqs = freqs/max(freqs.sum(), 1)
+        elif mode != "ct":
+            raise(Exception("Invalid 'mode' parameter: {}".format(mode)))
+        return((freqs, resp))
+
     def frequency_table(self, df, show_question=True, ct=True, 
                         pct_respondents=True, pct_responses=False, 
                         pct_format=".0%", remove_exclusions=True,
-                        show_totals=True):
+                        show_totals=True, formatted=True):
         cts, resp, nonresp = self.tally(df, remove_exclusions)
         data = []
         cols = []
         tots = []
+        # Unformatted tables keep numbers as numbers, with NaN for blanks
+        blank = "" if formatted else np.nan
         if show_question:
             data.append(self.scale.get_choices(remove_exclusions))
             cols.append("Answer")
@@ -518,18 +665,21 @@ class SelectMultipleQuestion(SelectQuestion):
             data.append(cts)
             cols.append("Count")
             tots.append(resp)
+        cts_arr = np.asarray(cts, dtype=float)
         if pct_respondents:
-            data.append([format(x/resp, pct_format) for x in cts])
+            data.append(_format_pcts(cts_arr/max(resp, 1), pct_format,
+                                     resp > 0, formatted))
             cols.append("% of respondents")
-            tots.append("")
+            tots.append(blank)
         if pct_responses:
-            data.append([format(x/sum(cts), pct_format) for x in cts])
+            n_responses = cts_arr.sum()
+            data.append(_format_pcts(cts_arr/max(n_responses, 1), 
+                                     pct_format, n_responses > 0, formatted))
             cols.append("% of responses")
-            tots.append("")
-        tbl = pd.DataFrame(data).T
-        tbl.columns = cols
+            tots.append(blank)
         if show_totals:
-            tbl.loc[len(tbl)] = tots
+            data = [d + [t] for d, t in zip(data, tots)]
+        tbl = pd.DataFrame(dict(zip(cols, data)), columns=cols)
         return(tbl)
 
 
@@ -539,18 +689,11 @@ class SelectMultipleQuestion(SelectQuestion):
                         show_mean=True, mean_format=".1f"):
         if type(other_question) != SelectOneQuestion:
             raise(Exception("Can only call cut_by_question on a SelectOneQuestion type"))
-        df = response_set.copy()
         # Here we remove the exclusions for the cut variable, the 
         # exclusions for this question are removed in cut_by, if 
         # appropriate
-        if remove_exclusions:
-            values_to_drop = [v for v, e in zip(other_question.values, 
-                              other_question.scale.exclude_from_analysis) if e]
-            for v in values_to_drop:
-                df[other_question.variable].replace(v, np.nan,
-                                                      inplace=True)
-
-        groups = df.groupby(other_question.label)
+        groups = other_question._group_by_responses(response_set.data, 
+                                                    remove_exclusions)
         group_mapping = dict(zip(other_question.scale.values, other_question.scale.choices))
 
         oth_text = cut_var_label
@@ -564,15 +707,12 @@ class SelectMultipleQuestion(SelectQuestion):
                question_label=None, pct_format=".0%",
                remove_exclusions=True):
 
-        freqs = []
-        for k, gp in groups:
-            t = (self.frequency_table(gp, True, False, True, False, 
-                 pct_format, remove_exclusions, False))
-            t.set_index("Answer", inplace=True)
-            series = t.ix[:,0]
-            series.name = group_label_mapping[k]
-            freqs.append(series)
-        df = pd.DataFrame(freqs)
+        keys, cts, resp = self._cut_by_raw(groups, remove_exclusions)
+        pcts = cts/np.maximum(resp, 1)[:, np.newaxis]
+        rows = [_format_pcts(p, pct_format, n > 0) 
+                for p, n in zip(pcts, resp)]
+        df = pd.DataFrame(rows, columns=self.scale.get_choices(remove_exclusions),
+                          index=[group_label_mapping[k] for k in keys])
 
         my_label = question_label
         if not my_label:
@@ -593,29 +733,24 @@ class SelectMultipleQuestion(SelectQuestion):
                    df.index.tolist()])
 
         # Add hierarchical index to columns
-        col_top_index = [my_label]*len(self.choices)
+        col_top_index = [my_label]*len(df.columns)
         df.columns = pd.MultiIndex.from_arrays([col_top_index, 
                      newcols])
 
         return(df)
 
     def compare_groups(self, groupby, remove_exclusions=True, pval = .05):
-        groupnames = groupby.groups.keys()
-        obs_by_cut = []
-        ct_by_cut = []
-        for k, df in groupby:
-            freqs, tot_resp, tot_nonresp = self.tally(df, remove_exclusions)
-            obs_by_cut.append(freqs)
-            ct_by_cut.append(tot_resp)
-        choice_totals = [sum(x) for x in zip(*obs_by_cut)]
-        exp_prop_per_choice = [t/sum(ct_by_cut) for t in choice_totals]
-        sigs = []
-        for f_obs, choice_tot, p_choice in zip(zip(*obs_by_cut), 
-            choice_totals, exp_prop_per_choice):
-            f_exp = [p_choice * ct for ct in ct_by_cut]
-            chisq, p = chisquare(f_obs, f_exp)
-            sigs.append(p < pval)
-        return(sigs)
+        vars = self.get_included_variables(remove_exclusions)
+        # Tally every group in one pass over the whole frame rather 
+        # than calling tally once per group
+        answered = groupby.obj[vars].notna()
+        codes = groupby.ngroup()
+        obs_by_cut = answered.groupby(codes).sum().to_numpy()
+        ct_by_cut = answered.any(axis=1).groupby(codes).sum().to_numpy()
+        choice_totals = obs_by_cut.sum(axis=0)
+        f_exp = np.outer(ct_by_cut, choice_totals/ct_by_cut.sum())
+        chisq, p = chisquare(obs_by_cut, f_exp, axis=0)
+        return((p < pval).tolist())
 
     def freq_table_to_json(self, df):
         t = self.frequency_table(df, True, True, True, False, ".9f", True, False)
@@ -1,4 +1,4 @@
-from itertools import compress
+import numpy as np
 
 class QuestionScale():
 
@@ -17,10 +17,41 @@ class QuestionScale():
     def __init__(self, choices, exclude_from_analysis):
         self.choices = choices
         self.exclude_from_analysis = exclude_from_analysis
+        self.clear_cache()
+
+    def clear_cache(self):
+        """
+        Drops memoized choice lists and masks. Must be called whenever 
+        choices, values or exclusions are changed.
+        """
+        self._cache = {}
+
+    def include_mask(self):
+        """
+        Returns a boolean array that is True for each choice that is 
+        not excluded from analysis.
+        """
+        if "include_mask" not in self._cache:
+            self._cache["include_mask"] = ~np.array(
+                self.exclude_from_analysis, dtype=bool).reshape(-1)
+        return(self._cache["include_mask"])
 
     def __eq__(self, other): 
-        return (self.choices == other.choices and 
-                self.exclude_from_analysis == other.exclude_from_analysis)
+        sig = self._signature()
+        other_sig = other._signature()
+        return(sig[0] == other_sig[0] and sig[1] == other_sig[1])
+
+    def _signature(self):
+        """
+        Returns a (hash, key) tuple identifying the choices, values and
+        exclusions of this scale. The hash lets most comparisons between
+        scales be settled by comparing two integers.
+        """
+        if "signature" not in self._cache:
+            key = (tuple(self.choices), tuple(self.exclude_from_analysis),
+                   tuple(getattr(self, "values", ())))
+            self._cache["signature"] = (hash(key), key)
+        return(self._cache["signature"])
 
     @staticmethod
     def change_scale(oldscale, new_type, new_values=None, new_midpoint=None):
@@ -35,13 +66,16 @@ class QuestionScale():
     def reverse_choices(self):
         self.choices.reverse()
         self.exclude_from_analysis.reverse()
+        self.clear_cache()
 
     def get_choices(self, remove_exclusions=True):
-        choices = self.choices
-        if remove_exclusions:
-            choices = list(compress(choices, 
-                      [not x for x in self.exclude_from_analysis]))
-        return(choices)
+        key = ("choices", remove_exclusions)
+        if key not in self._cache:
+            choices = self.choices
+            if remove_exclusions:
+                choices = np.array(choices, dtype=object)[self.include_mask()]
+            self._cache[key] = tuple(choices)
+        return(list(self._cache[key]))
 
     def exclude_choices_from_analysis(self, choices):
         new_excl = []
@@ -51,11 +85,11 @@ class QuestionScale():
             else:
                 new_excl.append(e)
         self.exclude_from_analysis = new_excl
+        self.clear_cache()
 
     def excluded_choices(self):
-        x = list(compress(self.choices, 
-                      [x for x in self.exclude_from_analysis]))
-        return(x)
+        x = np.array(self.choices, dtype=object)[~self.include_mask()]
+        return(x.tolist())
 
 class NominalScale(QuestionScale):
 
@@ -69,35 +103,49 @@ class OrdinalScale(QuestionScale):
         super().__init__(choices, exclude_from_analysis)
         self.values = values
 
-    def __eq__(self, other):
-        if super().__eq__(other):
-            return(self.values == other.values)
-        else:
-            return(False)
-
     def reverse_choices(self):
         super().reverse_choices()
         self.values.reverse()
+        self.clear_cache()
 
     def get_values(self, remove_exclusions=True):
-        values = self.values
-        if remove_exclusions:
-            values = list(compress(values, 
-                      [not x for x in self.exclude_from_analysis]))
-        return(values)
+        key = ("values", remove_exclusions)
+        if key not in self._cache:
+            values = self.values
+            if remove_exclusions:
+                values = [v for v, m in zip(values, self.include_mask()) if m]
+            self._cache[key] = tuple(values)
+        return(list(self._cache[key]))
+
+    def get_values_array(self, remove_exclusions=True):
+        """
+        Returns the values as a float array, for use in vectorized 
+        tallies.
+        """
+        key = ("values_array", remove_exclusions)
+        if key not in self._cache:
+            self._cache[key] = np.array(self.get_values(remove_exclusions), 
+                                        dtype=float)
+        return(self._cache[key])
 
     def choices_to_str(self, remove_exclusions=False, show_values=True):
-        choices = self.get_choices(remove_exclusions)
-        values = self.get_values(remove_exclusions)
-        if show_values:
-            new_choices = []
-            for c, v, x in zip(choices, values, self.exclude_from_analysis):
-                if x:
-                    new_choices.append("{} (X)".format(c))
-                else:
-                    new_choices.append("{} ({})".format(c, v))
-            choices = new_choices
-        return(choices)
+        key = ("choices_to_str", remove_exclusions, show_values)
+        if key not in self._cache:
+            choices = self.get_choices(remove_exclusions)
+            values = self.get_values(remove_exclusions)
+            excluded = self.exclude_from_analysis
+            if remove_exclusions:
+                excluded = [False]*len(choices)
+            if show_values:
+                new_choices = []
+                for c, v, x in zip(choices, values, excluded):
+                    if x:
+                        new_choices.append("{} (X)".format(c))
+                    else:
+                        new_choices.append("{} ({})".format(c, v))
+                choices = new_choices
+            self._cache[key] = tuple(choices)
+        return(list(self._cache[key]))
 
 
 class LikertScale(OrdinalScale):